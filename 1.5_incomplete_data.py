@@ -31,11 +31,11 @@ Part 2: Complete Fill Missing Values Implementation (active)
 
 KEY FUNCTIONS:
 --------------
-1. symbol_to_path(symbol, base_dir="data")
+1. symbol_to_path(symbol, base_dir="data")  [from util.py]
    - Constructs file path for stock CSV data
 
-2. get_data(symbols, dates)
-   - Reads multiple stock CSV files
+2. get_data(symbols, dates)  [from util.py]
+   - Reads multiple stock CSV files (parsed files are cached per process)
    - Joins data into single DataFrame
    - Handles SPY as reference stock
    - Removes non-trading days
@@ -104,63 +104,8 @@ Forward fill propagates the last valid observation forward to fill missing value
 
 import numpy as np
 import matplotlib.pyplot as plt
-import os
 import pandas as pd
-
-def symbol_to_path(symbol, base_dir="data"):
-	"""
-	Return CSV file path given ticker symbol.
-	
-	Args:
-		symbol: Stock ticker symbol (e.g., 'SPY', 'FAKE2')
-		base_dir: Base directory containing CSV files (default: "data")
-	
-	Returns:
-		Full path to the CSV file for the given symbol
-	"""
-	return os.path.join(base_dir, "{}.csv".format(str(symbol)))
-
-def get_data(symbollist, dates):
-	"""
-	Read stock data from CSV files and combine into a single DataFrame.
-	
-	This function:
-	- Creates an empty DataFrame with the specified date range as index
-	- Ensures SPY is included as a reference stock
-	- Reads adjusted close prices for each symbol
-	- Joins all data together
-	- Removes dates where SPY did not trade (market holidays)
-	
-	Args:
-		symbollist: List of stock ticker symbols to read
-		dates: Date range (pandas DatetimeIndex) for the data
-	
-	Returns:
-		DataFrame with dates as index and stock symbols as columns
-		May contain NaN values for missing data
-	"""
-	df_final = pd.DataFrame(index=dates)
-	
-	# Add SPY as reference if not already in the list
-	if "SPY" not in symbollist:
-		symbollist.insert(0, "SPY")
-	
-	# Read data for each symbol
-	for symbol in symbollist:
-		file_path = symbol_to_path(symbol)
-		# Read CSV: parse dates, use Date as index, only get Adj Close column
-		df_temp = pd.read_csv(file_path, parse_dates=True, index_col="Date",
-		                     usecols=["Date", "Adj Close"], na_values=["nan"])
-		# Rename column to match symbol name
-		df_temp = df_temp.rename(columns={'Adj Close': symbol})
-		# Join with main dataframe (left join on index)
-		df_final = df_final.join(df_temp)
-		
-		# Remove dates where SPY didn't trade (market holidays/weekends)
-		if symbol == "SPY":
-			df_final = df_final.dropna(subset=['SPY'])
-	
-	return df_final
+from util import get_data
 
 def plot(df_data):
 	"""
@@ -222,7 +167,7 @@ beginning of the dataset where forward fill cannot work.
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
+from util import get_data
 
 def fill_missing_values(df_data):
 	"""
@@ -261,60 +206,6 @@ def fill_missing_values(df_data):
 	df_data.bfill(inplace=True)
 	##########################################################
 
-def symbol_to_path(symbol, base_dir="data"):
-	"""
-	Return CSV file path given ticker symbol.
-	
-	Args:
-		symbol: Stock ticker symbol (e.g., 'SPY', 'JAVA')
-		base_dir: Base directory containing CSV files (default: "data")
-	
-	Returns:
-		Full path to the CSV file for the given symbol
-	"""
-	return os.path.join(base_dir, "{}.csv".format(str(symbol)))
-
-def get_data(symbols, dates):
-	"""
-	Read stock data (adjusted close) for given symbols from CSV files.
-	
-	This function:
-	- Creates a DataFrame with the specified date range
-	- Automatically adds SPY as a reference if not present
-	- Reads each symbol's CSV file and joins the data
-	- Removes dates where SPY did not trade
-	
-	Args:
-		symbols: List of stock ticker symbols
-		dates: Date range (pandas DatetimeIndex)
-	
-	Returns:
-		DataFrame with dates as index and symbols as columns
-		Contains NaN values for missing data points
-	"""
-	df_final = pd.DataFrame(index=dates)
-	
-	# Add SPY for reference if absent
-	if "SPY" not in symbols:
-		symbols.insert(0, "SPY")
-
-	# Read and join data for each symbol
-	for symbol in symbols:
-		file_path = symbol_to_path(symbol)
-		# Read CSV with Date as index, only Adj Close column
-		df_temp = pd.read_csv(file_path, parse_dates=True, index_col="Date",
-		                     usecols=["Date", "Adj Close"], na_values=["nan"])
-		# Rename column to symbol name
-		df_temp = df_temp.rename(columns={"Adj Close": symbol})
-		# Join with main dataframe
-		df_final = df_final.join(df_temp)
-		
-		# Drop dates where SPY did not trade (market holidays)
-		if symbol == "SPY":
-			df_final = df_final.dropna(subset=["SPY"])
-
-	return df_final
-
 def plot_data(df_data):
 	"""
 	Plot stock data with appropriate axis labels.
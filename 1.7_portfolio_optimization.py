@@ -67,37 +67,8 @@ KEY FUNCTIONS:
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 from scipy.optimize import minimize
-
-def symbol_to_path(symbol, base_dir="data"):
-	"""Return CSV file path given ticker symbol."""
-	return os.path.join(base_dir, "{}.csv".format(str(symbol)))
-
-def get_data(symbols, dates):
-	"""Read stock data (adjusted close) for given symbols from CSV files."""
-	df_final = pd.DataFrame(index=dates)
-	
-	# Add SPY for reference if absent
-	if "SPY" not in symbols:
-		symbols.insert(0, "SPY")
-
-	# Read and join data for each symbol
-	for symbol in symbols:
-		file_path = symbol_to_path(symbol)
-		# Read CSV with Date as index, only Adj Close column
-		df_temp = pd.read_csv(file_path, parse_dates=True, index_col="Date",
-		                     usecols=["Date", "Adj Close"], na_values=["nan"])
-		# Rename column to symbol name
-		df_temp = df_temp.rename(columns={"Adj Close": symbol})
-		# Join with main dataframe
-		df_final = df_final.join(df_temp)
-		
-		# Drop dates where SPY did not traded (market holidays)
-		if symbol == "SPY":
-			df_final = df_final.dropna(subset=["SPY"])
-
-	return df_final
+from util import get_data
 
 def normalize_data(df):
 	"""Normalize stock prices to start at 1.0."""
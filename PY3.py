@@ -38,14 +38,15 @@ if __name__ == "__main__":
 """Computing Max Closing Price"""
 
 import pandas as pd
+from util import load_summary
 
 def get_max_close (symbol):
     """Return the maximum closing value for stock indicated by symbol.
 
     Note: Data for a stock is stored in file: data/<symbol>.csv
+    The max is precomputed in its summary sidecar, so the CSV is not re-read.
     """
-    df = pd.read_csv("data/{}.csv".format(symbol))  # read in data
-    return  df['Close'].max() # compute and return max
+    return load_summary(symbol)["columns"]["Close"]["max"] # look up precomputed max
 
 def test_run():
     """Function called by Test Run."""
@@ -63,14 +64,15 @@ if __name__ == "__main__": # if run standalone
 
 import pandas as pd
 import matplotlib.pyplot as plt
+from util import load_summary
 	
 def get_mean_volume(symbol):
     """Return the mean volume for stock indicated by symbol.
     Note: Data for a stock is stored in file: data/<symbol>.csv
+    The mean is precomputed in its summary sidecar, so the CSV is not re-read.
     """
-    df = pd.read_csv("data/{}.csv".format(symbol))  # read in data
     # Quiz: Compute and return the mean volume for this stock
-    return df['Volume'].mean()
+    return load_summary(symbol)["columns"]["Volume"]["mean"]
    
 def test_run():
     """Function called by Test Run."""
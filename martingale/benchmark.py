@@ -0,0 +1,176 @@
+"""
+Martingale simulator throughput benchmarks
+
+Measures episodes per second and peak traced memory for run_episode and
+run_simulation across episode counts, both bankroll modes and every
+engine, writes the numbers as JSON and, given a baseline file, exits
+non-zero when any case got slower than the baseline by more than the
+threshold.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import martingale
+
+BANKROLLS = (None, 256)
+COUNTS = (1000, 10000, 100000, 1000000)
+REPEAT = 5
+MIN_TIME = 0.2
+
+def measure(fn, repeat=REPEAT, min_time=MIN_TIME, max_time=None):
+    """Best per-call wall time of fn over repeat rounds, and its peak traced memory.
+
+    Each round calls fn until at least min_time seconds have passed, so
+    short cases are not timed off a single noisy call. Rounds stop early
+    once max_time seconds have been spent, so a case whose single call is
+    long (and therefore steady) is not repeated past it. tracemalloc slows
+    pure-Python loops noticeably, so the timed calls run untraced and one
+    extra call is made under tracemalloc for the peak.
+    """
+    best = float("inf")
+    total = 0.0
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+        total += elapsed
+        if max_time is not None and total >= max_time:
+            break
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def bench_episodes(count=1000, repeat=REPEAT, min_time=MIN_TIME):
+    """run_episode throughput for each sampler."""
+    results = {}
+    for sampler in ("spin", "streak"):
+        for bankroll in BANKROLLS:
+            rng = np.random.default_rng(martingale.gtid())
+            seconds, peak = measure(lambda: [martingale.run_episode(18/38, bankroll, sampler, rng)
+                                             for _ in range(count)], repeat, min_time)
+            results[f"run_episode/{sampler}/{bankroll}/{count}"] = {
+                "episodes": count,
+                "seconds": seconds,
+                "episodes_per_sec": count / seconds,
+                "peak_bytes": peak,
+            }
+    return results
+
+def bench_simulation(counts=COUNTS, engines=None, repeat=REPEAT, budget=120.0,
+                     max_memory=2 * 1024 ** 3, min_time=MIN_TIME):
+    """run_simulation throughput per engine, bankroll mode and episode count.
+
+    Counts whose dense result matrix would exceed max_memory bytes are
+    measured through run_simulation_stats instead (recorded under a
+    run_simulation_stats/ key), which keeps memory bounded. Counts are run
+    smallest first; timed rounds stop once half of budget seconds is
+    spent, and a case is skipped (and recorded as such) when the previous
+    count's rate projects one timed plus one traced run past budget.
+    """
+    engines = sorted(martingale.ENGINES) if engines is None else engines
+    results = {}
+    for engine in engines:
+        for bankroll in BANKROLLS:
+            rate = None
+            for count in sorted(counts):
+                run = martingale.run_simulation
+                if count * 1001 * 8 > max_memory:
+                    run = martingale.run_simulation_stats
+                key = f"{run.__name__}/{engine}/{bankroll}/{count}"
+                if rate is not None and 2 * count / rate > budget:
+                    results[key] = {"episodes": count, "skipped": "projected time exceeds budget"}
+                    continue
+                seconds, peak = measure(lambda: run(count, bankroll, engine=engine,
+                                                    seed=martingale.gtid()),
+                                        repeat, min_time, budget / 2)
+                rate = count / seconds
+                results[key] = {
+                    "episodes": count,
+                    "seconds": seconds,
+                    "episodes_per_sec": rate,
+                    "peak_bytes": peak,
+                }
+    return results
+
+def find_regressions(results, baseline, threshold):
+    """Cases whose episodes/sec fell more than threshold below the baseline."""
+    regressions = []
+    for key, base in baseline["results"].items():
+        current = results.get(key)
+        if current is None or "episodes_per_sec" not in current or "episodes_per_sec" not in base:
+            continue
+        ratio = current["episodes_per_sec"] / base["episodes_per_sec"]
+        if ratio < 1 - threshold:
+            regressions.append((key, base["episodes_per_sec"], current["episodes_per_sec"], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", default=",".join(str(c) for c in COUNTS),
+                        help="comma-separated episode counts for run_simulation")
+    parser.add_argument("--engines", default=None, help="comma-separated engines (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed rounds per case, best is kept")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME,
+                        help="minimum seconds per timed round; short cases are called repeatedly")
+    parser.add_argument("--budget", type=float, default=120.0, help="max projected seconds per case")
+    parser.add_argument("--max-memory", type=float, default=2 * 1024 ** 3,
+                        help="max bytes for one dense result matrix; larger counts use "
+                             "run_simulation_stats")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write results")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed fractional slowdown versus the baseline")
+    args = parser.parse_args(argv)
+    
+    counts = [int(float(c)) for c in args.counts.split(",")]
+    engines = args.engines.split(",") if args.engines else None
+    results = bench_episodes(repeat=args.repeat, min_time=args.min_time)
+    results.update(bench_simulation(counts, engines, args.repeat, args.budget, args.max_memory,
+                                    args.min_time))
+    
+    report = {
+        "engine_version": martingale.ENGINE_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    
+    for key, case in results.items():
+        if "skipped" in case:
+            print(f"{key:45s} skipped: {case['skipped']}")
+        else:
+            print(f"{key:45s} {case['episodes_per_sec']:12.0f} episodes/s "
+                  f"{case['peak_bytes'] / 2 ** 20:9.1f} MiB peak")
+    
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for key, before, after, ratio in regressions:
+        print(f"REGRESSION {key}: {before:.0f} -> {after:.0f} episodes/s ({ratio:.0%} of baseline)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
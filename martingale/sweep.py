@@ -0,0 +1,123 @@
+"""
+Martingale parameter sweeps with an on-disk result cache
+"""
+
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from martingale import ENGINE_VERSION, SHARD_SIZE, SpinStats, gtid, run_strategy
+
+DEFAULT_PARAMS = {
+    "win_prob": 18/38,
+    "bankroll": None,
+    "target": 80,
+    "max_spins": 1000,
+    "strategy": "martingale",
+}
+
+def grid_cells(grid):
+    """Expand {name: [values, ...]} into one params dict per grid cell."""
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        yield params
+
+def cell_key(params, num_episodes, seed):
+    """Hash of everything that determines a cell's result."""
+    blob = json.dumps({"params": params, "num_episodes": num_episodes, "seed": seed,
+                       "engine_version": ENGINE_VERSION}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def run_cell(params, num_episodes, seed):
+    """Simulate one grid cell and return its summary statistics."""
+    rng = np.random.default_rng(np.random.SeedSequence(int(cell_key(params, num_episodes, seed), 16)))
+    bankroll = params["bankroll"]
+    lo = -bankroll if bankroll is not None else -1024
+    stats = SpinStats(lo=lo, hi=2 * params["target"] + (bankroll or 1024), spins=params["max_spins"])
+    wins = busts = 0
+    total = total_sq = 0.0
+    
+    for start in range(0, num_episodes, SHARD_SIZE):
+        block = run_strategy(params["strategy"], params["win_prob"],
+                             min(SHARD_SIZE, num_episodes - start), bankroll,
+                             params["target"], params["max_spins"], rng)
+        stats.update(block)
+        final = block[:, -1]
+        wins += int(np.sum(final >= params["target"]))
+        if bankroll is not None:
+            busts += int(np.sum(final <= -bankroll))
+        total += final.sum()
+        total_sq += np.dot(final, final)
+    
+    expected = total / max(num_episodes, 1)
+    return {
+        "mean": stats.mean,
+        "std": stats.std(),
+        "median": stats.median(),
+        "p_win": wins / max(num_episodes, 1),
+        "p_bust": busts / max(num_episodes, 1),
+        "expected": expected,
+        "final_std": np.sqrt(max(total_sq / max(num_episodes, 1) - expected ** 2, 0.0)),
+        "episodes": num_episodes,
+    }
+
+def _compute_and_store(params, num_episodes, seed, path):
+    summary = run_cell(params, num_episodes, seed)
+    # Write next to the target and rename, so a killed sweep never leaves
+    # a truncated file that later runs would take as cached.
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, params=json.dumps(params), **summary)
+    os.replace(tmp, path)
+    return path
+
+def load_cell(path):
+    with np.load(path) as data:
+        summary = {name: data[name] for name in data.files if name != "params"}
+        params = json.loads(str(data["params"]))
+    for name in ("p_win", "p_bust", "expected", "final_std", "episodes"):
+        summary[name] = summary[name].item()
+    return params, summary
+
+def run_sweep(grid, num_episodes=1000, seed=None, cache_dir="sweep_cache", workers=None):
+    """Run every cell of grid, reusing cached cells from earlier sweeps.
+
+    grid maps any of the DEFAULT_PARAMS names to a list of values, e.g.
+    {"bankroll": [None, 128, 256], "win_prob": [18/38, 0.5]}. Each cell's
+    summary is stored in cache_dir as <hash>.npz, keyed by its parameters,
+    num_episodes, seed and ENGINE_VERSION, and only missing cells are
+    computed, spread over a process pool. Returns [(params, summary), ...]
+    in grid order.
+    """
+    seed = gtid() if seed is None else seed
+    os.makedirs(cache_dir, exist_ok=True)
+    cells = [(params, os.path.join(cache_dir, cell_key(params, num_episodes, seed) + ".npz"))
+             for params in grid_cells(grid)]
+    missing = [(params, path) for params, path in cells if not os.path.exists(path)]
+    
+    if missing:
+        if workers is not None and workers <= 1:
+            for params, path in missing:
+                _compute_and_store(params, num_episodes, seed, path)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = [pool.submit(_compute_and_store, params, num_episodes, seed, path)
+                        for params, path in missing]
+                for job in jobs:
+                    job.result()
+    
+    return [load_cell(path) for _, path in cells]
+
+if __name__ == "__main__":
+    grid = {
+        "bankroll": [None, 128, 256, 512],
+        "win_prob": [18/38, 0.5],
+    }
+    for params, summary in run_sweep(grid, num_episodes=10000):
+        print(f"win_prob={params['win_prob']:.4f} bankroll={params['bankroll']}: "
+              f"P(win) = {summary['p_win']:.4f}, E[winnings] = {summary['expected']:.2f}")
@@ -0,0 +1,41 @@
+"""Tests for util.py's price panel updates."""
+
+import os
+import shutil
+
+import pandas as pd
+
+import util
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def append_row(base_dir, symbol, date, price):
+    with open(util.symbol_to_path(symbol, base_dir), "a") as f:
+        f.write("{},{p},{p},{p},{p},1000,{p}\n".format(date, p=price))
+
+def test_update_panel_backfills_rows_that_arrive_after_spy(tmp_path):
+    base_dir = str(tmp_path / "data")
+    shutil.copytree(DATA_DIR, base_dir)
+    util.build_panel(["XOM", "GLD"], str(tmp_path / "panel"), base_dir=base_dir)
+    dates = pd.date_range("2012-12-24", "2013-01-05")
+
+    # SPY gets the new day first; XOM's row arrives only after an update ran
+    append_row(base_dir, "SPY", "2013-01-02", 150.0)
+    append_row(base_dir, "GLD", "2013-01-02", 160.0)
+    panel = util.update_panel(str(tmp_path / "panel"), base_dir=base_dir)
+    assert pd.isna(panel.get_data(["XOM"], dates).loc["2013-01-02", "XOM"])
+
+    append_row(base_dir, "XOM", "2013-01-02", 7.5)
+    panel = util.update_panel(str(tmp_path / "panel"), base_dir=base_dir)
+
+    expected = util.get_data(["XOM", "GLD"], dates, base_dir=base_dir, bulk=False)
+    pd.testing.assert_frame_equal(panel.get_data(["XOM", "GLD"], dates), expected)
+    assert panel.get_data(["XOM"], dates).loc["2013-01-02", "XOM"] == 7.5
+
+def test_update_panel_without_new_rows_is_a_no_op(tmp_path):
+    base_dir = str(tmp_path / "data")
+    shutil.copytree(DATA_DIR, base_dir)
+    built = util.build_panel(["XOM"], str(tmp_path / "panel"), base_dir=base_dir)
+    updated = util.update_panel(str(tmp_path / "panel"), base_dir=base_dir)
+    assert updated.filled == built.filled
+    pd.testing.assert_index_equal(updated.dates, built.dates)
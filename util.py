@@ -0,0 +1,843 @@
+"""
+Shared stock data loading for the ML4T exercises.
+
+Every exercise used to carry its own copy of symbol_to_path/get_data and
+re-parse data/<symbol>.csv on each call. This module keeps one loader for
+all of them, backed by a process-wide LRU cache of parsed price series.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 256
+PANEL_HEADROOM = 252  # spare rows per panel column, about a year of daily appends
+RANGE_READ_FRACTION = 0.25
+BINARY_CACHE_DIR = ".cache"
+DATETIME_UNITS = ["s", "ms", "us", "ns"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Adj Close"]
+SUMMARY_STATS = ["min", "max", "mean", "count"]
+
+def symbol_to_path(symbol, base_dir="data"):
+    """Return CSV file path given ticker symbol."""
+    return os.path.join(base_dir, "{}.csv".format(str(symbol)))
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _prefix_sha256(path, size):
+    """SHA-256 of the first size bytes and of the whole file, in one pass."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(size))
+        prefix = digest.hexdigest()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return prefix, digest.hexdigest()
+
+def _read_appended(path, old_size, last_date):
+    """
+    Parse the rows written after the first old_size bytes of a price CSV.
+
+    Returns None unless the file looks appended to: the old contents end
+    on a row boundary and every new row is dated after last_date.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        if old_size <= len(header):
+            return None
+        f.seek(old_size - 1)
+        if f.read(1) != b"\n":
+            return None
+        tail = f.read()
+    if not tail.strip():
+        return None
+    df = pd.read_csv(io.BytesIO(header + tail), index_col="Date", parse_dates=True,
+                     na_values=["nan"])
+    if not len(df) or not df.index.is_monotonic_increasing or df.index[0] <= pd.Timestamp(last_date):
+        return None
+    return df
+
+def _cache_path(path, suffix):
+    base_dir, name = os.path.split(path)
+    return os.path.join(base_dir, BINARY_CACHE_DIR, os.path.splitext(name)[0] + suffix)
+
+def _binary_paths(path):
+    return _cache_path(path, ".npz"), _cache_path(path, ".json")
+
+def _write_atomic(path, write):
+    # mkstemp gives every writer (process or thread) its own temp file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                               prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def _summarize(df):
+    """Per-column aggregates of a whole price file, as stored in its sidecar."""
+    stats = df.agg(SUMMARY_STATS)
+    return {"rows": len(df),
+            "first": str(df.index.min().date()) if len(df) else None,
+            "last": str(df.index.max().date()) if len(df) else None,
+            "columns": {column: {stat: float(stats.at[stat, column]) for stat in SUMMARY_STATS}
+                        for column in df.columns}}
+
+def _merge_summary(summary, tail):
+    """summary (see _summarize) extended with the rows of tail."""
+    added = _summarize(tail)
+    columns = {}
+    for column, old in summary["columns"].items():
+        new = added["columns"][column]
+        count = old["count"] + new["count"]
+        total = (old["mean"] * old["count"] if old["count"] else 0.0) + \
+                (new["mean"] * new["count"] if new["count"] else 0.0)
+        columns[column] = {"min": float(np.fmin(old["min"], new["min"])),
+                           "max": float(np.fmax(old["max"], new["max"])),
+                           "mean": total / count if count else float("nan"),
+                           "count": count}
+    return {"rows": summary["rows"] + added["rows"], "first": summary["first"] or added["first"],
+            "last": added["last"], "columns": columns}
+
+def _append_binary(path, stat, meta):
+    """
+    Extend the binary cache with rows appended to the CSV since meta's stamp.
+
+    Only the new tail is parsed; its arrays are concatenated onto the
+    cached ones and the summary is updated from the tail's aggregates.
+    Returns the new meta, or None when the file changed in any other way.
+    """
+    if stat.st_size <= meta["size"] or not meta["summary"]["last"]:
+        return None
+    prefix, sha256 = _prefix_sha256(path, meta["size"])
+    if prefix != meta["sha256"]:
+        return None
+    tail = _read_appended(path, meta["size"], meta["summary"]["last"])
+    if tail is None or list(tail.columns) != meta["columns"]:
+        return None
+    npz_path, meta_path = _binary_paths(path)
+    with np.load(npz_path) as data:
+        arrays = {name: data[name] for name in data.files}
+    arrays["Date"] = np.concatenate([arrays["Date"], tail.index.values])
+    for column in tail.columns:
+        arrays[column] = np.concatenate([arrays[column], tail[column].to_numpy()])
+    meta = dict(meta, size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256,
+                summary=_merge_summary(meta["summary"], tail))
+    try:
+        _write_atomic(npz_path, lambda f: np.savez(f, **arrays))
+        _write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+    except OSError:
+        return None
+    return meta
+
+def _build_binary(path, stat):
+    """Parse the CSV once and store every column as a binary array."""
+    df = pd.read_csv(path, index_col="Date", parse_dates=True, na_values=["nan"])
+    arrays = {"Date": df.index.values}
+    for column in df.columns:
+        arrays[column] = df[column].to_numpy()
+    npz_path, meta_path = _binary_paths(path)
+    meta = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": _file_sha256(path), "columns": list(df.columns),
+            "summary": _summarize(df)}
+    try:
+        os.makedirs(os.path.dirname(npz_path), exist_ok=True)
+        _write_atomic(npz_path, lambda f: np.savez(f, **arrays))
+        _write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+    except OSError:
+        pass  # read-only data directory: keep working from the parsed CSV
+    return df
+
+def read_price_columns(path, columns):
+    """
+    Return the given columns of a price CSV as a date-indexed DataFrame.
+
+    The first read converts the whole CSV into a columnar binary cache
+    (<base_dir>/.cache/<symbol>.npz, one array per column, plus a .json
+    stamp that also holds the per-column summary, see load_summary).
+    Later reads load just the requested arrays from it. The cache
+    is rebuilt when the CSV's size or mtime changes and its SHA-256 no
+    longer matches; a touched but identical file only gets a new stamp,
+    and a file that only gained rows at the end has just those rows
+    parsed and appended (see _append_binary).
+    """
+    stat = os.stat(path)
+    npz_path, meta_path = _binary_paths(path)
+    meta = None
+    if os.path.exists(npz_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta["size"], meta["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            if stat.st_size > meta["size"] and "summary" in meta:
+                meta = _append_binary(path, stat, meta)
+            elif meta["sha256"] == _file_sha256(path):
+                meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                try:
+                    _write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+                except OSError:
+                    pass
+            else:
+                meta = None
+    if meta is None or "summary" not in meta or not set(columns) <= set(meta["columns"]):
+        return _build_binary(path, stat)[list(columns)]
+    
+    with np.load(npz_path) as data:
+        index = pd.DatetimeIndex(data["Date"], name="Date")
+        return pd.DataFrame({column: data[column] for column in columns}, index=index)
+
+def load_summary(symbol, base_dir="data"):
+    """
+    Return the precomputed aggregates of one symbol's whole file.
+
+    The result is {"rows", "first", "last", "columns": {column: {"min",
+    "max", "mean", "count"}}}, read from the .json sidecar that
+    read_price_columns keeps next to the binary cache; the CSV itself is
+    only parsed when the sidecar is missing or stale.
+    """
+    path = symbol_to_path(symbol, base_dir)
+    stat = os.stat(path)
+    _, meta_path = _binary_paths(path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+    if meta is None or "summary" not in meta or \
+            (meta["size"], meta["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+        read_price_columns(path, [])  # refreshes or rebuilds the sidecar
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except OSError:  # read-only data directory: summarize in memory
+            return _summarize(read_price_columns(path, PRICE_COLUMNS))
+    return meta["summary"]
+
+def load_summaries(symbols=None, base_dir="data"):
+    """
+    One row of aggregates per symbol, for screening without the price files.
+
+    Columns are rows/first/last plus a (column, stat) pair for each
+    summary value, e.g. ("Close", "max") or ("Volume", "mean"). symbols
+    defaults to every CSV in base_dir.
+    """
+    if symbols is None:
+        symbols = sorted(os.path.splitext(name)[0] for name in os.listdir(base_dir)
+                         if name.endswith(".csv"))
+    records = {}
+    for symbol in symbols:
+        summary = load_summary(symbol, base_dir)
+        record = {("rows", ""): summary["rows"], ("first", ""): summary["first"],
+                  ("last", ""): summary["last"]}
+        for column, stats in summary["columns"].items():
+            for stat, value in stats.items():
+                record[(column, stat)] = value
+        records[symbol] = record
+    return pd.DataFrame.from_dict(records, orient="index")
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _read_column(path, mtime_ns, size, column):
+    # mtime_ns and size are only part of the cache key: a rewritten file
+    # gets a new key, and the stale entry ages out of the LRU.
+    return read_price_columns(path, [column])[column]
+
+def load_symbol(symbol, column="Adj Close", base_dir="data"):
+    """
+    Return one column of a symbol's CSV as a date-indexed Series.
+
+    Parsed series are cached per process, keyed by file path and the file's
+    mtime and size, so repeated loads of an unchanged file are dictionary
+    lookups. Treat the returned Series as read-only; copy it before
+    modifying it in place.
+    """
+    path = symbol_to_path(symbol, base_dir)
+    stat = os.stat(path)
+    return _read_column(path, stat.st_mtime_ns, stat.st_size, column).rename(symbol)
+
+def _build_date_index(path, stat):
+    """Byte offset of every data row, and its date, for a date-sorted CSV."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    ends = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == ord("\n")) + 1
+    if len(raw) and raw[-1:] != b"\n":
+        ends = np.append(ends, len(raw))
+    dates = pd.read_csv(io.BytesIO(raw), usecols=["Date"], parse_dates=["Date"])["Date"]
+    # Row starts are the header's end plus each row's end but the last;
+    # anything unusual (blank or quoted multi-line rows, unsorted dates)
+    # leaves the index unusable and callers read the whole file instead.
+    usable = len(ends) == len(dates) + 1 and dates.is_monotonic_increasing
+    index = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "usable": usable,
+        "header": raw[:ends[0]] if len(ends) else b"",
+        "offsets": ends if usable else np.zeros(1, dtype=np.int64),
+        "dates": dates.values if usable else dates.values[:0],
+    }
+    try:
+        os.makedirs(os.path.dirname(_cache_path(path, ".idx.npz")), exist_ok=True)
+        _write_atomic(_cache_path(path, ".idx.npz"), lambda f: np.savez(
+            f, size=index["size"], mtime_ns=index["mtime_ns"], usable=usable,
+            header=np.frombuffer(index["header"], dtype=np.uint8),
+            offsets=index["offsets"], dates=index["dates"]))
+    except OSError:
+        pass
+    return index
+
+def _extend_date_index(path, stat, data):
+    """The saved index data extended over rows appended since it was built, or None."""
+    old_size = int(data["size"])
+    if not bool(data["usable"]) or stat.st_size <= old_size or not len(data["dates"]):
+        return None
+    tail = _read_appended(path, old_size, data["dates"][-1])
+    if tail is None:
+        return None
+    with open(path, "rb") as f:
+        f.seek(old_size)
+        raw = f.read()
+    ends = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == ord("\n")) + 1
+    if raw[-1:] != b"\n":
+        ends = np.append(ends, len(raw))
+    if len(ends) != len(tail):
+        return None
+    index = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "usable": True,
+        "header": data["header"].tobytes(),
+        "offsets": np.concatenate([data["offsets"], old_size + ends]),
+        "dates": np.concatenate([data["dates"], tail.index.values]),
+    }
+    try:
+        _write_atomic(_cache_path(path, ".idx.npz"), lambda f: np.savez(
+            f, size=index["size"], mtime_ns=index["mtime_ns"], usable=True,
+            header=data["header"], offsets=index["offsets"], dates=index["dates"]))
+    except OSError:
+        pass
+    return index
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _date_index(path, mtime_ns, size):
+    idx_path = _cache_path(path, ".idx.npz")
+    index = None
+    if os.path.exists(idx_path):
+        with np.load(idx_path) as data:
+            if (int(data["size"]), int(data["mtime_ns"])) == (size, mtime_ns):
+                return {"usable": bool(data["usable"]), "header": data["header"].tobytes(),
+                        "offsets": data["offsets"], "dates": pd.DatetimeIndex(data["dates"])}
+            index = _extend_date_index(path, os.stat(path), data)  # appended rows only
+    if index is None:
+        index = _build_date_index(path, os.stat(path))
+    index["dates"] = pd.DatetimeIndex(index["dates"])
+    return index
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _read_rows(path, mtime_ns, size, column, first, last):
+    index = _date_index(path, mtime_ns, size)
+    if first == last:
+        dtype = _read_column(path, mtime_ns, size, column).dtype  # what a non-empty read would give
+        return pd.Series([], index=index["dates"][:0], name=column, dtype=dtype)
+    with open(path, "rb") as f:
+        f.seek(index["offsets"][first])
+        chunk = f.read(index["offsets"][last] - index["offsets"][first])
+    return pd.read_csv(io.BytesIO(index["header"] + chunk), index_col="Date", parse_dates=True,
+                       usecols=["Date", column], na_values=["nan"])[column]
+
+def load_symbol_range(symbol, start, end, column="Adj Close", base_dir="data"):
+    """
+    Like load_symbol, restricted to dates in [start, end].
+
+    A sidecar index (<base_dir>/.cache/<symbol>.idx.npz) maps each row's
+    date to its byte offset, so a short window seeks to its first row and
+    parses only the rows inside it. Windows covering more than
+    RANGE_READ_FRACTION of the file are sliced from the full cached
+    series instead, as are files the index cannot describe.
+    """
+    path = symbol_to_path(symbol, base_dir)
+    stat = os.stat(path)
+    index = _date_index(path, stat.st_mtime_ns, stat.st_size)
+    if index["usable"]:
+        first = index["dates"].searchsorted(pd.Timestamp(start))
+        last = index["dates"].searchsorted(pd.Timestamp(end), side="right")
+        if last - first <= RANGE_READ_FRACTION * len(index["dates"]):
+            return _read_rows(path, stat.st_mtime_ns, stat.st_size, column, first, last).rename(symbol)
+    series = load_symbol(symbol, column, base_dir)
+    return series[(series.index >= pd.Timestamp(start)) & (series.index <= pd.Timestamp(end))]
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _calendar(path, mtime_ns, size, colname):
+    cal_path = _cache_path(path, ".calendar.npz")
+    if os.path.exists(cal_path):
+        with np.load(cal_path) as data:
+            if (int(data["size"]), int(data["mtime_ns"]), str(data["colname"])) == (size, mtime_ns, colname):
+                return pd.DatetimeIndex(data["dates"])
+    prices = read_price_columns(path, [colname])[colname]
+    days = prices.index[prices.notna()].rename(None)
+    try:
+        os.makedirs(os.path.dirname(cal_path), exist_ok=True)
+        _write_atomic(cal_path, lambda f: np.savez(f, size=size, mtime_ns=mtime_ns, colname=colname,
+                                                   dates=days.values))
+    except OSError:
+        pass
+    return days
+
+def trading_calendar(reference="SPY", base_dir="data", colname="Adj Close"):
+    """
+    Every date on which the reference symbol has a colname price, sorted.
+
+    Derived once per version of the reference file and persisted to
+    <base_dir>/.cache/<reference>.calendar.npz, so later processes load
+    the index without touching the prices.
+    """
+    path = symbol_to_path(reference, base_dir)
+    stat = os.stat(path)
+    return _calendar(path, stat.st_mtime_ns, stat.st_size, colname)
+
+def trading_days(dates, base_dir="data", reference="SPY", colname="Adj Close"):
+    """
+    Dates within dates on which the reference symbol traded.
+
+    Gives the index get_data's join and dropna(subset=["SPY"]) would
+    (same order, finer of the two datetime units) by searchsorted into
+    trading_calendar: a daily date_range becomes a single slice of the
+    calendar, any other dates are matched position by position.
+    """
+    calendar = trading_calendar(reference, base_dir, colname)
+    return _match_days(calendar, pd.DatetimeIndex(dates))[1]
+
+def _match_days(calendar, dates):
+    """(rows, index): calendar positions of the dates found in it, and their aligned index."""
+    unit = max(dates.unit, calendar.unit, key=DATETIME_UNITS.index)
+    if len(dates) and dates.freq == pd.offsets.Day() and dates.is_monotonic_increasing \
+            and dates[0] == dates[0].normalize():
+        first = calendar.searchsorted(dates[0])
+        last = calendar.searchsorted(dates[-1], side="right")
+        rows = slice(first, last)
+        if last - first in (0, len(dates)):  # every date or none: keep dates' freq, as a mask would
+            return rows, dates[:last - first].as_unit(unit)
+        return rows, calendar[rows].as_unit(unit).rename(dates.name)
+    positions = calendar.searchsorted(dates)
+    traded = positions < len(calendar)
+    traded[traded] = calendar[positions[traded]] == dates[traded]
+    return positions[traded], dates[traded].as_unit(unit)
+
+def clear_cache():
+    """Drop every cached series (e.g. after editing files within a second)."""
+    _read_column.cache_clear()
+    _date_index.cache_clear()
+    _read_rows.cache_clear()
+    _calendar.cache_clear()
+
+_store = None
+
+def set_store(store):
+    """Route get_data through store for this process (None restores the CSV files)."""
+    global _store
+    _store = store
+
+def get_data(symbols, dates, colname="Adj Close", base_dir="data", panel=None, bulk=True,
+             store=None):
+    """
+    Read stock data (adjusted close) for given symbols from CSV files.
+
+    SPY is inserted at the front of symbols (in place) if absent, and dates
+    SPY did not trade are dropped.
+
+    Args:
+        symbols: List of stock ticker symbols
+        dates: Date range (pandas DatetimeIndex) for the data
+        colname: CSV column to load (default: "Adj Close")
+        base_dir: Directory containing the CSV files (default: "data")
+        panel: Optional PricePanel to slice instead of reading CSV files
+        bulk: Read the files concurrently and build the frame in one step
+            (default); False uses the original per-symbol join loop
+        store: Optional storage backend (e.g. SqliteStore) to query
+            instead of the CSV files; defaults to the one set_store chose
+
+    Returns:
+        DataFrame with dates as index and symbols as columns
+        May contain NaN values for missing data
+    """
+    if panel is not None:
+        return panel.get_data(symbols, dates)
+    store = _store if store is None else store
+    if store is not None:
+        return store.get_data(symbols, dates, colname)
+    if bulk:
+        return get_data_bulk(symbols, dates, colname, base_dir)
+    df = pd.DataFrame(index=dates)
+    if "SPY" not in symbols:  # add SPY for reference, if absent
+        symbols.insert(0, "SPY")
+
+    for symbol in symbols:
+        df = df.join(load_symbol(symbol, colname, base_dir))
+        if symbol == "SPY":  # drop dates SPY did not trade
+            df = df.dropna(subset=["SPY"])
+    return df
+
+def get_data_bulk(symbols, dates, colname="Adj Close", base_dir="data", max_workers=8):
+    """
+    get_data without the growing join: same result, built in one allocation.
+
+    All symbol files are read concurrently on a thread pool (only the
+    requested window, see load_symbol_range), the rows come from SPY's
+    precomputed trading calendar (see trading_days), and each series is
+    reindexed straight into its column of a preallocated float64 matrix,
+    so the cost grows linearly with the number of symbols. Integer columns
+    (e.g. Volume) are then restored to their dtype wherever the join would
+    not have introduced NaN, see _restore_int_columns.
+    """
+    if "SPY" not in symbols:  # add SPY for reference, if absent
+        symbols.insert(0, "SPY")
+    dates = pd.DatetimeIndex(dates)
+    start, end = dates.min(), dates.max()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as pool:
+        series = list(pool.map(lambda symbol: load_symbol_range(symbol, start, end, colname, base_dir),
+                               symbols))
+
+    calendar = trading_days(dates, base_dir, colname=colname)  # dates SPY traded
+    values = np.empty((len(calendar), len(symbols)))
+    for i, prices in enumerate(series):
+        values[:, i] = prices.reindex(calendar).to_numpy(dtype=np.float64, na_value=np.nan)
+    df = pd.DataFrame(values, index=calendar, columns=list(symbols), copy=False)
+    return _restore_int_columns(df, [prices.dtype for prices in series],
+                                [prices.index for prices in series], dates)
+
+def _restore_int_columns(df, dtypes, row_dates, dates):
+    """
+    Give integer source columns back their dtype where the join loop keeps it.
+
+    The join only turns a column into float64 when it leaves a NaN in it.
+    SPY and every symbol joined before it see all requested dates (the
+    non-trading ones are dropped only once SPY is in), so for them that
+    is any requested date missing from row_dates; for later symbols it is
+    a trading day they have no row for.
+    """
+    spy = list(df.columns).index("SPY")
+    for i, dtype in enumerate(dtypes):
+        if dtype.kind not in "iu":
+            continue
+        column = df.iloc[:, i]
+        complete = dates.isin(row_dates[i]).all() if i <= spy else column.notna().all()
+        if complete:
+            df.isetitem(i, column.to_numpy().astype(dtype))
+    return df
+
+def _row_dates(symbol, base_dir="data"):
+    """Every date symbol's file has a row for, from the range index when it can."""
+    path = symbol_to_path(symbol, base_dir)
+    stat = os.stat(path)
+    index = _date_index(path, stat.st_mtime_ns, stat.st_size)
+    if index["usable"]:
+        return index["dates"]
+    return load_symbol(symbol, base_dir=base_dir).index
+
+def get_ohlcv(symbols, dates, columns=None, base_dir="data", max_workers=8):
+    """
+    Read several price columns per symbol into one (symbol, field) panel.
+
+    Like get_data (SPY is added, rows are SPY's trading days), but the
+    result has a two-level column index, so df["XOM"] is that symbol's
+    OHLCV frame and df.xs("Close", axis=1, level="Field") is a
+    symbols-wide close table. columns defaults to all of PRICE_COLUMNS.
+    """
+    columns = list(PRICE_COLUMNS if columns is None else columns)
+    if "SPY" not in symbols:  # add SPY for reference, if absent
+        symbols.insert(0, "SPY")
+    dates = pd.DatetimeIndex(dates)
+    start, end = dates.min(), dates.max()
+
+    def load(symbol):
+        return [load_symbol_range(symbol, start, end, column, base_dir) for column in columns]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as pool:
+        series = list(pool.map(load, symbols))
+
+    calendar = trading_days(dates, base_dir)  # dates SPY traded
+    values = np.empty((len(calendar), len(symbols) * len(columns)))
+    for i, symbol_series in enumerate(series):
+        for j, prices in enumerate(symbol_series):
+            values[:, i * len(columns) + j] = prices.reindex(calendar).to_numpy(
+                dtype=np.float64, na_value=np.nan)
+    index = pd.MultiIndex.from_product([list(symbols), columns], names=["Symbol", "Field"])
+    return pd.DataFrame(values, index=calendar, columns=index, copy=False)
+
+def build_panel(symbols, panel_dir, colname="Adj Close", base_dir="data", dtype="float64"):
+    """
+    Write a persistent dates-by-symbols price panel to panel_dir.
+
+    Rows are SPY's trading days and columns are SPY followed by the other
+    symbols in the given order. Values go to one column-major raw file
+    (values.bin) so each symbol's history is contiguous, with dates.npy,
+    and meta.json (symbols, dtype, shape, capacity, and the last date
+    each symbol's file covered) alongside. Each column has PANEL_HEADROOM
+    spare rows so update_panel can append new days in place. Open it with
+    PricePanel.
+    """
+    symbols = ["SPY"] + [symbol for symbol in symbols if symbol != "SPY"]
+    dates = trading_calendar("SPY", base_dir, colname)
+    capacity = len(dates) + PANEL_HEADROOM
+    os.makedirs(panel_dir, exist_ok=True)
+    values = np.memmap(os.path.join(panel_dir, "values.bin"), dtype=dtype, mode="w+",
+                       shape=(capacity, len(symbols)), order="F")
+    filled = []
+    for i, symbol in enumerate(symbols):
+        prices = load_symbol(symbol, colname, base_dir)
+        values[:len(dates), i] = prices.reindex(dates).to_numpy()
+        filled.append(_filled_through(prices, dates, None))
+    values.flush()
+    del values
+    np.save(os.path.join(panel_dir, "dates.npy"), dates.values)
+    meta = {"symbols": symbols, "dtype": np.dtype(dtype).name, "shape": [len(dates), len(symbols)],
+            "capacity": capacity, "colname": colname, "filled": filled}
+    with open(os.path.join(panel_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return PricePanel(panel_dir)
+
+def _filled_through(prices, dates, previous):
+    """Last of dates that prices has a row for, as meta.json stores it."""
+    covered = prices.index[prices.index <= dates[-1]] if len(dates) else prices.index[:0]
+    return str(covered[-1].date()) if len(covered) else previous
+
+def update_panel(panel_dir, base_dir="data"):
+    """
+    Append the days SPY gained since build_panel (or the last update).
+
+    New rows are written into each column's spare capacity. Each symbol's
+    rows after the last date its file covered (meta.json "filled") are
+    read again, so a file that gets a day's row after SPY's is backfilled
+    on the next update; only those windows are read. meta.json is
+    rewritten last, so an interrupted update leaves the previous panel
+    intact. When the spare rows run out the panel is rebuilt with fresh
+    headroom.
+    """
+    panel = PricePanel(panel_dir)
+    dates = trading_calendar("SPY", base_dir, panel.colname)
+    new = dates[dates > panel.dates[-1]]
+    all_dates = panel.dates.append(new)
+    stale = [i for i, filled in enumerate(panel.filled)
+             if filled is None or pd.Timestamp(filled) < all_dates[-1]]
+    if not len(new) and not stale:
+        return panel
+    rows = len(all_dates)
+    if rows > panel.capacity:
+        return build_panel(panel.symbols, panel_dir, panel.colname, base_dir, panel.values.dtype)
+    values = np.memmap(os.path.join(panel_dir, "values.bin"), dtype=panel.values.dtype, mode="r+",
+                       shape=(panel.capacity, len(panel.symbols)), order="F")
+    filled = list(panel.filled)
+    for i in stale:
+        first = 0 if filled[i] is None else all_dates.searchsorted(pd.Timestamp(filled[i]), side="right")
+        window = all_dates[first:]
+        prices = load_symbol_range(panel.symbols[i], window[0], window[-1], panel.colname, base_dir)
+        values[first:rows, i] = prices.reindex(window).to_numpy()
+        filled[i] = _filled_through(prices, window, filled[i])
+    values.flush()
+    del values
+    np.save(os.path.join(panel_dir, "dates.npy"), all_dates.values)
+    meta = {"symbols": panel.symbols, "dtype": panel.values.dtype.name,
+            "shape": [rows, len(panel.symbols)], "capacity": panel.capacity,
+            "colname": panel.colname, "filled": filled}
+    _write_atomic(os.path.join(panel_dir, "meta.json"), lambda f: f.write(json.dumps(meta).encode()))
+    return PricePanel(panel_dir)
+
+class PricePanel:
+    """A build_panel directory opened read-only through np.memmap."""
+
+    def __init__(self, panel_dir):
+        with open(os.path.join(panel_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.panel_dir = panel_dir
+        self.symbols = meta["symbols"]
+        self.colname = meta["colname"]
+        rows, width = meta["shape"]
+        self.capacity = meta.get("capacity", rows)
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(panel_dir, "dates.npy"))[:rows])
+        # Panels written before "filled" was tracked count as complete
+        self.filled = meta.get("filled", [str(self.dates[-1].date()) if rows else None] * width)
+        self.values = np.memmap(os.path.join(panel_dir, "values.bin"), dtype=meta["dtype"],
+                                mode="r", shape=(self.capacity, width), order="F")[:rows]
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def get_data(self, symbols, dates):
+        """
+        Same result as util.get_data, sliced out of the memory-mapped panel.
+
+        Rows are matched against the panel's trading days as trading_days
+        does. When dates is a daily date_range and the requested symbols
+        (after SPY is inserted) sit next to each other in the panel, the
+        DataFrame is a zero-copy view of the file. Otherwise only the
+        requested cells are gathered into memory, in the caller's order.
+        """
+        if "SPY" not in symbols:  # add SPY for reference, if absent
+            symbols.insert(0, "SPY")
+        columns = [self._position[symbol] for symbol in symbols]
+        
+        rows, index = _match_days(self.dates, pd.DatetimeIndex(dates))
+        
+        if columns == list(range(columns[0], columns[0] + len(columns))):
+            cols = slice(columns[0], columns[0] + len(columns))
+        else:
+            cols = columns
+        values = self.values[rows][:, cols]
+        return pd.DataFrame(values, index=index, columns=list(symbols), copy=False)
+
+def iter_data(symbols, dates, chunk="year", colname="Adj Close", base_dir="data"):
+    """
+    Yield get_data(symbols, dates) as consecutive row blocks.
+
+    chunk is "year" for one calendar year per block, or an int for that
+    many trading days per block. Every block has the same columns (SPY
+    first, inserted into symbols in place as get_data does) and only the
+    block's rows are loaded, so memory stays bounded however long the
+    date range is. Concatenating the blocks gives the get_data frame.
+    """
+    if "SPY" not in symbols:  # add SPY for reference, if absent
+        symbols.insert(0, "SPY")
+    dates = pd.DatetimeIndex(dates)
+    calendar = trading_days(dates, base_dir, colname=colname)
+    # Symbols up to SPY turn float64 in the whole request's join if it asks
+    # for a date they have no row for; blocks only hold trading days.
+    missing = dates[~dates.isin(calendar)]
+    spy = symbols.index("SPY")
+    floats = {symbol: np.float64 for symbol in symbols[:spy + 1]
+              if len(missing) and not missing.isin(_row_dates(symbol, base_dir)).all()}
+    if chunk == "year":
+        bounds = np.flatnonzero(np.diff(calendar.year)) + 1
+    else:
+        bounds = np.arange(chunk, len(calendar), chunk)
+    for block in np.split(np.arange(len(calendar)), bounds):
+        if len(block):
+            df = get_data_bulk(list(symbols), calendar[block], colname, base_dir)
+            yield df.astype(floats) if floats else df
+
+def stream_daily_returns(chunks):
+    """Daily returns per block, carrying each block's last row into the next."""
+    previous = None
+    for df in chunks:
+        shifted = df.shift(1)
+        if previous is None:
+            shifted.iloc[0] = df.iloc[0]  # first day's return is 0, as in compute_daily_returns
+        else:
+            shifted.iloc[0] = previous
+        previous = df.iloc[-1]
+        yield df / shifted - 1
+
+def stream_rolling_mean(chunks, window):
+    """Rolling mean per block, carrying the last window - 1 rows between blocks."""
+    tail = None
+    for df in chunks:
+        joined = df if tail is None else pd.concat([tail, df])
+        yield joined.rolling(window=window).mean().iloc[len(joined) - len(df):]
+        tail = joined.iloc[max(len(joined) - (window - 1), 0):]
+
+def stream_portfolio_value(chunks, allocs, start_val):
+    """Portfolio value per block, normalising every block by the first day's prices."""
+    first = None
+    for df in chunks:
+        if first is None:
+            first = df.iloc[0]
+        yield (df / first * allocs * start_val).sum(axis=1)
+
+class CsvStore:
+    """The default backend: one data/<symbol>.csv file per symbol."""
+
+    def __init__(self, base_dir="data"):
+        self.base_dir = base_dir
+
+    def symbol_to_path(self, symbol):
+        return symbol_to_path(symbol, self.base_dir)
+
+    def get_data(self, symbols, dates, colname="Adj Close"):
+        return get_data_bulk(symbols, dates, colname, self.base_dir)
+
+class SqliteStore:
+    """
+    Prices for many symbols in one SQLite file.
+
+    Rows live in a WITHOUT ROWID table keyed on (symbol, date), so each
+    symbol's history is stored clustered in date order and a range query
+    is an index seek plus a sequential scan. Fill it with import_csv and
+    pass it to get_data (or set_store) to query it instead of the CSVs.
+    """
+
+    COLUMNS = {"Open": "open", "High": "high", "Low": "low", "Close": "close",
+               "Volume": "volume", "Adj Close": "adj_close"}
+    BATCH = 500  # symbols per query, well under SQLite's bound-parameter limit
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume INTEGER, adj_close REAL,
+                PRIMARY KEY (symbol, date)
+            ) WITHOUT ROWID""")
+
+    def close(self):
+        self.conn.close()
+
+    def import_csv(self, symbols=None, base_dir="data"):
+        """Load data/<symbol>.csv files into the store, replacing existing rows."""
+        if symbols is None:
+            symbols = sorted(os.path.splitext(name)[0] for name in os.listdir(base_dir)
+                             if name.endswith(".csv"))
+        names = list(self.COLUMNS)
+        with self.conn:
+            for symbol in symbols:
+                df = read_price_columns(symbol_to_path(symbol, base_dir), names)
+                df = df.astype(object).where(df.notna(), None)
+                rows = zip([symbol] * len(df), df.index.strftime("%Y-%m-%d"),
+                           *(df[name].tolist() for name in names))
+                self.conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                      rows)
+        return symbols
+
+    def symbols(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT symbol FROM prices ORDER BY symbol")]
+
+    def load_panel(self, symbols, start, end, colname="Adj Close"):
+        """One colname column per symbol for dates in [start, end], in batched queries."""
+        column = self.COLUMNS[colname]
+        start = pd.Timestamp(start).strftime("%Y-%m-%d")
+        end = pd.Timestamp(end).strftime("%Y-%m-%d")
+        frames = []
+        for i in range(0, len(symbols), self.BATCH):
+            batch = list(symbols[i:i + self.BATCH])
+            query = ("SELECT symbol, date, {} FROM prices WHERE symbol IN ({}) "
+                     "AND date BETWEEN ? AND ?").format(column, ", ".join("?" * len(batch)))
+            frames.append(pd.DataFrame(self.conn.execute(query, batch + [start, end]).fetchall(),
+                                       columns=["symbol", "date", colname]))
+        rows = pd.concat(frames)
+        panel = rows.pivot(index="date", columns="symbol", values=colname)
+        panel.index = pd.DatetimeIndex(panel.index)
+        return panel.reindex(columns=list(symbols)).astype(np.float64)
+
+    def get_data(self, symbols, dates, colname="Adj Close"):
+        """get_data semantics (SPY inserted, SPY trading days only) from the store."""
+        if "SPY" not in symbols:  # add SPY for reference, if absent
+            symbols.insert(0, "SPY")
+        dates = pd.DatetimeIndex(dates)
+        panel = self.load_panel(symbols, dates.min(), dates.max(), colname)
+        calendar = dates[dates.isin(panel.index[panel["SPY"].notna()])]
+        calendar = calendar.as_unit(max(dates.unit, panel.index.unit, key=DATETIME_UNITS.index))
+        df = panel.reindex(calendar)
+        df.columns.name = None
+        dtype = np.dtype(np.int64 if self.COLUMNS[colname] == "volume" else np.float64)
+        row_dates = [panel.index[panel.iloc[:, i].notna()] for i in range(len(symbols))]
+        return _restore_int_columns(df, [dtype] * len(symbols), row_dates, dates)